@@ -0,0 +1,14 @@
+import os
+
+# Run with: gunicorn -c gunicorn_conf.py app:app
+#
+# preload_app loads the (mmapped) model once in the master before
+# forking, so workers share its read-only pages copy-on-write instead of
+# each re-reading the pickle. Threaded workers let /predict requests run
+# concurrently — the GIL is released inside numpy/sklearn C code — which
+# also feeds the micro-batching worker larger batches.
+preload_app = True
+bind = f"0.0.0.0:{os.environ.get('PORT', 7860)}"
+workers = os.cpu_count() or 1
+worker_class = "gthread"
+threads = 8